@@ -6,7 +6,13 @@ import os
 from pprint import pformat
 from typing import Any, Dict
 
-from yaml import safe_load as load
+from yaml import load
+
+try:
+    # libyaml bindings when available
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 
 from .listener import MPRISListener
 from .slobble import SlackAPI, Slobble, NoScrobble
@@ -24,6 +30,7 @@ def cli():
         listener_config, slobble.handle_track_update, slobble.handle_stop_playing
     )
     listener.run_loop()
+    slobble.close()
 
 
 def setup() -> tuple[bool, Dict[str, str], Dict[str, Any], Dict[str, Any]]:
@@ -55,4 +62,4 @@ def setup_parser() -> argparse.ArgumentParser:
 def read_config_file(config_file: str) -> Dict[str, Any]:
     assert os.path.isfile(config_file), f"not a file: {config_file}"
     with open(config_file, "r") as fh:
-        return load(fh)
+        return load(fh, Loader=SafeLoader)
@@ -1,7 +1,10 @@
 __all__ = [
+    "MPRIS_NAMESPACE",
     "MPRIS_PARTIAL_INTERFACE",
+    "MPRIS_PARTIAL_INTERFACE_LENGTH",
     "MPRIS_INTERFACE",
     "DBUS_INTERFACE",
+    "DBUS_NAME",
     "MPRIS_PATH",
     "PLAYBACK_STATUS",
     "METADATA",
@@ -9,9 +12,12 @@ __all__ = [
 ]
 
 
-MPRIS_PARTIAL_INTERFACE = "org.mpris.MediaPlayer2."
+MPRIS_NAMESPACE = "org.mpris.MediaPlayer2"
+MPRIS_PARTIAL_INTERFACE = MPRIS_NAMESPACE + "."
+MPRIS_PARTIAL_INTERFACE_LENGTH = len(MPRIS_PARTIAL_INTERFACE)
 MPRIS_INTERFACE = MPRIS_PARTIAL_INTERFACE + "Player"
 DBUS_INTERFACE = "org.freedesktop.DBus.Properties"
+DBUS_NAME = "org.freedesktop.DBus"
 MPRIS_PATH = "/org/mpris/MediaPlayer2"
 PLAYBACK_STATUS = "PlaybackStatus"
 METADATA = "Metadata"
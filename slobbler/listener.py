@@ -1,12 +1,12 @@
 import logging
 import signal
 import typing as typ
-from collections import OrderedDict
-from dataclasses import dataclass, fields
-from math import ceil
+from dataclasses import dataclass
+from functools import partial
 from pprint import pformat
 
 import dbus
+import dbus.lowlevel
 import dbus.mainloop.glib
 from dbus.exceptions import DBusException
 from gi.repository import GLib
@@ -14,99 +14,166 @@ from gi.repository import GLib
 from .constants import (
     DBUS_ERROR_UNKNOWN_METHOD,
     DBUS_INTERFACE,
+    DBUS_NAME,
     METADATA,
     MPRIS_INTERFACE,
+    MPRIS_NAMESPACE,
     MPRIS_PARTIAL_INTERFACE,
+    MPRIS_PARTIAL_INTERFACE_LENGTH,
     MPRIS_PATH,
     PLAYBACK_STATUS,
 )
 
 DBUS_DICT_TYPE = typ.MutableMapping[dbus.String, typ.Any]
-ANY_PRIMITIVE = str | int | float | bool
 
 
-@dataclass
+@dataclass(slots=True, frozen=True, eq=False)
 class TrackInfo:
     artist: str
     title: str
     album: str
     length: int
 
+    field_names: typ.ClassVar[tuple[str, ...]] = ("artist", "title", "album", "length")
+
     @classmethod
     def from_mpris(cls, metadata: DBUS_DICT_TYPE):
-        track_length = metadata.get("mpris:length", 0)
+        get = metadata.get
+        track_length = int(get("mpris:length", 0))
         return cls(
-            artist=",".join(metadata.get("xesam:artist", [""])),  # array expected
-            title=str(metadata.get("xesam:title", "")),
-            album=str(metadata.get("xesam:album", "")),
-            # convert from microseconds to seconds
-            length=int(ceil(track_length / 1000000) if track_length else 0),
+            artist=cls.join_artists(get("xesam:artist")),
+            title=str(get("xesam:title", "")),
+            album=str(get("xesam:album", "")),
+            # convert from microseconds to seconds, rounding up with integer math
+            length=-(-track_length // 1000000),
         )
 
-    def to_dict(self) -> typ.Dict[str, ANY_PRIMITIVE]:
-        return {
-            "artist": self.artist,
-            "title": self.title,
-            "album": self.album,
-            "length": self.length,
-        }
+    @staticmethod
+    def join_artists(artists: typ.Sequence[str] | str | None) -> str:
+        # array expected, but some players send a plain string
+        if not artists:
+            return ""
+        if isinstance(artists, str):
+            return str(artists)
+        if len(artists) == 1:
+            return str(artists[0])
+        return ",".join(artists)
 
     def empty_fields(self) -> typ.Generator[str, None, None]:
-        return (field.name for field in fields(self) if not self[field.name])
+        return (name for name in self.field_names if not self[name])
 
     def __getitem__(self, attribute: str):
+        # mapping style access to the track fields only, lets str.format_map()
+        # read them directly
+        if attribute not in self.field_names:
+            raise KeyError(attribute)
         return getattr(self, attribute)
 
+    def __eq__(self, other) -> bool:
+        # compared on every metadata update, the int length is the cheapest
+        # field to tell tracks apart and no tuples are built
+        if self is other:
+            return True
+        if not isinstance(other, TrackInfo):
+            return NotImplemented
+        return (
+            self.length == other.length
+            and self.title == other.title
+            and self.artist == other.artist
+            and self.album == other.album
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.artist, self.title, self.album, self.length))
+
     def __str__(self):
         return f"artist='{self.artist}' title='{self.title}' album='{self.album}' length={self.length}s"
 
 
 class Player:
+    __slots__ = (
+        "logger",
+        "debounce_interval",
+        "_full_name",
+        "_name",
+        "_repr",
+        "_playback_status",
+        "_is_playing",
+        "_playback_status_changed",
+        "_playback_started",
+        "_track_info",
+        "_track_info_changed",
+        "_metadata_key",
+        "_metadata_received",
+        "bus_id",
+        "interface",
+        "_pending_message",
+        "_flush_source_id",
+        "_bus",
+        "playback_status_changed_callback",
+        "metadata_update_callback",
+    )
+    query_timeout = 2.0  # seconds
+
     def __init__(
         self,
         full_name: str,
         bus: dbus.SessionBus,
         playback_status_changed_callback: typ.Callable[[str], None],
         metadata_update_callback: typ.Callable[[str], None],
+        debounce_interval: int,
     ):
         self.logger = logging.getLogger(self.__class__.__name__)
+        # milliseconds to wait for more PropertiesChanged signals before handling them
+        self.debounce_interval = debounce_interval
         self._full_name: str = ""
         self._name: str = ""
+        self._repr: str = ""
         self._playback_status: str = "Stopped"
         self._is_playing: bool = False
         self._playback_status_changed: bool = False
         self._playback_started: bool = False
         self._track_info: TrackInfo | None = None
         self._track_info_changed: bool = False
-        self.accepted_message_types = {PLAYBACK_STATUS, METADATA}
+        self._metadata_key: tuple | None = None
+        self._metadata_received: bool = False
         self.bus_id = None
         self.interface = None
-        self._signal_connection = None
+        self._pending_message: DBUS_DICT_TYPE = {}
+        self._flush_source_id: int = 0
 
         self._bus = bus
         self.full_name = full_name
         self.playback_status_changed_callback = playback_status_changed_callback
         self.metadata_update_callback = metadata_update_callback
 
-    def connect(self):
-        self.bus_id, self.interface = self._get_interface(self.full_name)
-        self.playback_status = self.query_playback_status()
-        if self.is_playing:
-            self.track_info = self.query_metadata()
-
-        self._signal_connection = self.connect_signal()
+    def connect(self, bus_id: str | None = None):
+        # a known unique name saves resolving the well-known name's owner
+        self.bus_id, self.interface = self._get_interface(bus_id or self.full_name)
+        self.update_repr()
+        # don't wait on the player, one round trip for both PlaybackStatus and
+        # Metadata, the reply is handled like a PropertiesChanged
+        self.interface.GetAll(
+            MPRIS_INTERFACE,
+            reply_handler=self.update_properties,
+            error_handler=partial(
+                self.handle_query_error, "properties", {}, self.update_properties
+            ),
+            timeout=self.query_timeout,
+        )
 
     def __del__(self):
         self.close()
 
     def close(self):
-        if self._signal_connection:
-            self._signal_connection.remove()
+        if self._flush_source_id:
+            GLib.source_remove(self._flush_source_id)
+            self._flush_source_id = 0
 
     @staticmethod
     def strip_mpris(player_name: str) -> str:
-        # human friendly name
-        return player_name.replace(MPRIS_PARTIAL_INTERFACE, "")
+        # human friendly name, player names always start with the MPRIS prefix
+        return player_name[MPRIS_PARTIAL_INTERFACE_LENGTH:]
 
     @property
     def full_name(self) -> str:
@@ -116,6 +183,7 @@ class Player:
     def full_name(self, full_name: str):
         self._full_name = full_name
         self._name = self.strip_mpris(self._full_name)
+        self.update_repr()
 
     @property
     def name(self) -> str:
@@ -160,6 +228,21 @@ class Player:
 
     @track_info.setter
     def track_info(self, metadata: DBUS_DICT_TYPE):
+        # compare the raw values first, players often resend identical metadata
+        get = metadata.get
+        metadata_key = (
+            get("xesam:title"),
+            get("xesam:album"),
+            get("xesam:artist"),
+            get("mpris:length"),
+        )
+        if self._track_info is not None and metadata_key == self._metadata_key:
+            self._track_info_changed = False
+            return
+
+        self._metadata_key = metadata_key
+        if metadata:
+            self._metadata_received = True
         new_track_info = TrackInfo.from_mpris(metadata)
         self._track_info_changed = self._track_info != new_track_info
         self._track_info = new_track_info
@@ -173,61 +256,107 @@ class Player:
     def handle_properties_changed(
         self, interface_name, message: DBUS_DICT_TYPE, *args, **kwargs
     ):
-        if not self.accepted_message_types.intersection(message.keys()):
+        metadata: DBUS_DICT_TYPE | None = message.get(METADATA)
+        playback_status: str | None = message.get(PLAYBACK_STATUS)
+        if metadata is None and playback_status is None:
             # some players send noise around their capabilities, ignore that
             return
 
-        self.logger.debug(
-            f"handle_properties_changed(): [{repr(self)}]: {pformat(dict(message), indent=2)}"
-        )
+        # players send bursts of signals, only handle the latest state of each property
+        if metadata is not None:
+            self._pending_message[METADATA] = metadata
+        if playback_status is not None:
+            self._pending_message[PLAYBACK_STATUS] = playback_status
+        if not self._flush_source_id:
+            self._flush_source_id = GLib.timeout_add(
+                self.debounce_interval, self.flush_properties_changed
+            )
+
+    def flush_properties_changed(self) -> bool:
+        message, self._pending_message = self._pending_message, {}
+        self._flush_source_id = 0
+        self.update_properties(message)
+        return GLib.SOURCE_REMOVE
+
+    def update_properties(self, message: DBUS_DICT_TYPE):
         metadata: DBUS_DICT_TYPE | None = message.get(METADATA)
         playback_status: str | None = message.get(PLAYBACK_STATUS)
+        if metadata is None and playback_status == self.playback_status:
+            # repeated playback status without metadata, nothing has changed
+            return
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            # pformat is expensive, skip it unless it will be logged
+            self.logger.debug(
+                f"update_properties(): [{repr(self)}]: {pformat(message, indent=2)}"
+            )
 
         if playback_status:
             self.playback_status = playback_status
-            if self.playback_started:
+            if self.playback_started and not metadata and not self._metadata_received:
                 # some players, notably Spotify, don't update metadata from startup -> playing
-                self.track_info = metadata if metadata else self.query_metadata()
-            if self.playback_status_changed:
-                self.playback_status_changed_callback(self.bus_id)
+                # the status change is reported once the metadata arrives
+                self.query_interface(METADATA, {}, self.handle_started_metadata_reply)
+            else:
+                if self.playback_started and metadata:
+                    self.track_info = metadata
+                if self.playback_status_changed:
+                    self.playback_status_changed_callback(self.bus_id)
 
         if metadata:
             self.track_info = metadata
             if self.is_playing and self.track_info_changed:
                 self.metadata_update_callback(self.bus_id)
 
-    def connect_signal(self) -> dbus.connection.SignalMatch:
-        return self.interface.connect_to_signal(
-            "PropertiesChanged",
-            self.handle_properties_changed,
-            dbus_interface=DBUS_INTERFACE,
-        )
-
-    def query_playback_status(self) -> dbus.types.String:
-        return self.query_interface(PLAYBACK_STATUS, "Stopped")
+    def handle_started_metadata_reply(self, metadata: DBUS_DICT_TYPE):
+        self.track_info = metadata
+        self.playback_status_changed_callback(self.bus_id)
 
-    def query_metadata(self) -> DBUS_DICT_TYPE:
-        return self.query_interface(METADATA, {})
+    def query_interface(
+        self,
+        query_method: str,
+        default: typ.Any,
+        reply_handler: typ.Callable[[typ.Any], None],
+    ):
+        # async, a slow or stuck player can't block the main loop
+        self.interface.Get(
+            MPRIS_INTERFACE,
+            query_method,
+            reply_handler=reply_handler,
+            error_handler=partial(
+                self.handle_query_error, query_method, default, reply_handler
+            ),
+            timeout=self.query_timeout,
+        )
 
-    def query_interface(self, query_method: str, default: typ.Any):
-        try:
-            return self.interface.Get(MPRIS_INTERFACE, query_method)
-        except DBusException as err:
+    def handle_query_error(
+        self,
+        query_method: str,
+        default: typ.Any,
+        reply_handler: typ.Callable[[typ.Any], None],
+        err: DBusException,
+    ):
+        if err.get_dbus_name() == DBUS_ERROR_UNKNOWN_METHOD:
             # some players don't have some methods on startup
-            if err.get_dbus_name() == DBUS_ERROR_UNKNOWN_METHOD:
-                self.logger.error(f"[{repr(self)}]: Unable to query {query_method}")
-                return default
-            raise err
+            self.logger.error(f"[{repr(self)}]: Unable to query {query_method}")
+        else:
+            self.logger.error(f"[{repr(self)}]: Failed to query {query_method}: {err}")
+        reply_handler(default)
 
     def _get_interface(self, service: str) -> tuple[str, dbus.Interface]:
-        player = self._bus.get_object(service, MPRIS_PATH)
+        # only Properties methods are called, introspection is a wasted round trip
+        player = self._bus.get_object(service, MPRIS_PATH, introspect=False)
         return str(player.bus_name), dbus.Interface(player, DBUS_INTERFACE)
 
     def __str__(self):
         return self.name
 
+    def update_repr(self):
+        # repr is used in most log lines, only build it when name or bus id change
+        self._repr = f"{self.name}{self.bus_id}"
+
     def __repr__(self) -> str:
-        return f"{self.name}{self.bus_id}"
+        return self._repr
 
 
 class PlayerManager:
@@ -236,35 +365,70 @@ class PlayerManager:
         ignore_players: typ.Iterable[str],
         player_update_callback: typ.Callable[[Player], None],
         player_stopped_callback: typ.Callable[[Player], None],
+        debounce_interval: int,
     ):
         self.logger = logging.getLogger(self.__class__.__name__)
         self._bus = dbus.SessionBus()
         self.ignore_players = tuple(ignore_players)
+        self.debounce_interval = debounce_interval
         self.player_update_callback = player_update_callback
         self.player_stopped_callback = player_stopped_callback
 
-        self.players: typ.OrderedDict[str, Player] = OrderedDict()
+        self.players: typ.Dict[str, Player] = {}
         self.playing_player_id = None
-        self.add_existing_players()
+        # bus ids of playing players, most recently started playing last
+        self._playing_stack: typ.List[str] = []
 
-        self._session_bus = self._bus.get_object(
-            "org.freedesktop.DBus", "/org/freedesktop/DBus"
+        # one match rule for every player, the bus daemon only sends changes to
+        # the MPRIS player interface, dispatched by sender
+        self._properties_signal = self._bus.add_signal_receiver(
+            self.handle_properties_changed,
+            signal_name="PropertiesChanged",
+            dbus_interface=DBUS_INTERFACE,
+            path=MPRIS_PATH,
+            arg0=MPRIS_INTERFACE,
+            sender_keyword="sender",
         )
-        # listen to new and exiting players
-        self._signal_connection = self._session_bus.connect_to_signal(
-            "NameOwnerChanged", self.handle_player_connection
+        self.add_existing_players()
+
+        # listen to new and exiting players, the bus daemon only sends name
+        # changes within the MPRIS namespace
+        self._name_owner_rule = (
+            f"type='signal',sender='{DBUS_NAME}',interface='{DBUS_NAME}',"
+            f"member='NameOwnerChanged',arg0namespace='{MPRIS_NAMESPACE}'"
         )
+        # keep the bound method, filters are removed by identity
+        self._name_owner_filter = self.filter_name_owner_changed
+        self._bus.add_match_string_non_blocking(self._name_owner_rule)
+        self._bus.add_message_filter(self._name_owner_filter)
 
     def __del__(self):
         self.close()
 
     def close(self):
-        self._signal_connection.remove()
+        if self._properties_signal:
+            self._properties_signal.remove()
+            self._properties_signal = None
+        if self._name_owner_filter:
+            self._bus.remove_message_filter(self._name_owner_filter)
+            self._bus.remove_match_string_non_blocking(self._name_owner_rule)
+            self._name_owner_filter = None
+
+    def filter_name_owner_changed(
+        self, bus: dbus.SessionBus, message: dbus.lowlevel.Message
+    ):
+        # message filters see every message on the connection, pick out ours
+        if (
+            isinstance(message, dbus.lowlevel.SignalMessage)
+            and message.get_member() == "NameOwnerChanged"
+            and message.get_interface() == DBUS_NAME
+        ):
+            self.handle_player_connection(*message.get_args_list())
 
     def handle_player_connection(
         self, player_name: str, old_bus_id: str, new_bus_id: str
     ):
-        if player_name.startswith(MPRIS_PARTIAL_INTERFACE):
+        if self.is_player_name(player_name):
             self.logger.debug(
                 f"handle_player_connection({player_name=} {old_bus_id=} {new_bus_id=})"
             )
@@ -280,10 +444,26 @@ class PlayerManager:
                     )
 
             elif not old_bus_id and new_bus_id:
-                self.update_player(player_name)
+                self.update_player(player_name, new_bus_id)
+
+    def handle_properties_changed(
+        self,
+        interface_name: str,
+        message: DBUS_DICT_TYPE,
+        *args,
+        sender: str | None = None,
+    ):
+        player = self.players.get(sender)
+        if player is not None:
+            player.handle_properties_changed(interface_name, message)
 
     def playback_status_changed(self, bus_id: str):
-        player = self[bus_id]
+        player = self.players.get(bus_id)
+        if player is None:
+            # player exited while its update was pending
+            return
+
+        self.update_playing_stack(player)
         self.logger.debug(
             f"[{player}] playback_status_changed() {player.playback_status=}, {player.bus_id}, {self.playing_player_id=}"
         )
@@ -296,7 +476,10 @@ class PlayerManager:
             self.handle_player_not_playing(player)
 
     def metadata_update(self, bus_id: str):
-        player = self[bus_id]
+        player = self.players.get(bus_id)
+        if player is None:
+            return
+
         self.logger.debug(
             f"[{player}]: metadata_update() {player.playback_status=}, {player.track_info=}"
         )
@@ -311,37 +494,39 @@ class PlayerManager:
 
     def handle_new_playing_player(self, bus_id: str):
         self.playing_player_id = bus_id
-        self.move_to_start(self.playing_player_id)
         self.send_new_player_update()
 
+    def update_playing_stack(self, player: Player):
+        if player.bus_id in self._playing_stack:
+            self._playing_stack.remove(player.bus_id)
+        if player.is_playing:
+            self._playing_stack.append(player.bus_id)
+
     def find_first_playing_player(self) -> str:
-        bus_id = next(
-            (bus_id for bus_id, player in self.players.items() if player.is_playing),
-            None,
-        )
-        if bus_id:
-            self.move_to_start(bus_id)
-        else:
+        bus_id = self._playing_stack[-1] if self._playing_stack else None
+        if not bus_id:
             self.logger.info(f"No playing players of {len(self)}")
 
         return bus_id
 
-    def update_player(self, player_name: str) -> Player:
+    def update_player(self, player_name: str, bus_id: str | None = None) -> Player:
         player = Player(
-            player_name, self._bus, self.playback_status_changed, self.metadata_update
+            player_name,
+            self._bus,
+            self.playback_status_changed,
+            self.metadata_update,
+            self.debounce_interval,
         )
         if any(ignore_player in player.name for ignore_player in self.ignore_players):
             self.logger.info(f"Ignoring player: {player.name}")
             return
 
-        player.connect()
+        player.connect(bus_id)
         self.players[player.bus_id] = player
 
-        self.logger.info(f"[{repr(player)}] Connected, {player.playback_status}")
-
-        if player.is_playing:
-            # in case a player starts up playing
-            self.handle_new_playing_player(player.bus_id)
+        # in case a player starts up playing, playback_status_changed() handles
+        # it once the player replies with its playback status
+        self.logger.info(f"[{repr(player)}] Connected")
 
     def send_new_player_update(self) -> bool:
         if self.playing_player_id:
@@ -349,23 +534,31 @@ class PlayerManager:
             return True
         return False
 
+    @staticmethod
+    def is_player_name(bus_name: str) -> bool:
+        # length first, rejects unique names like ":1.42" without a string compare
+        return (
+            len(bus_name) > MPRIS_PARTIAL_INTERFACE_LENGTH
+            and bus_name[:MPRIS_PARTIAL_INTERFACE_LENGTH] == MPRIS_PARTIAL_INTERFACE
+        )
+
     def find_players(self) -> typ.Generator[str, None, None]:
+        is_player_name = self.is_player_name
         return (
             str(player_name)
             for player_name in self._bus.list_names()
-            if player_name.startswith(MPRIS_PARTIAL_INTERFACE)
+            if is_player_name(player_name)
         )
 
     def add_existing_players(self):
         for player_name in self.find_players():
             self.update_player(player_name)
 
-    def move_to_start(self, bus_id: str):
-        self.players.move_to_end(bus_id, last=False)
-
     def pop(self, bus_id: str) -> Player | None:
         player = self.players.pop(bus_id, None)
         if player:
+            if bus_id in self._playing_stack:
+                self._playing_stack.remove(bus_id)
             player.close()
             self.logger.info(f"[{repr(player)}] Disconnected, {player.playback_status}")
 
@@ -382,6 +575,15 @@ class PlayerManager:
 
 
 class MPRISListener:
+    __slots__ = (
+        "logger",
+        "track_update_callback",
+        "stopped_playing_callback",
+        "exit_signals",
+        "_last_track",
+        "player_manager",
+    )
+
     def __init__(
         self,
         config: typ.Dict[str, typ.Any],
@@ -392,10 +594,14 @@ class MPRISListener:
         self.track_update_callback = track_update_callback
         self.stopped_playing_callback = stopped_playing_callback
         self.exit_signals = (signal.SIGTERM, signal.SIGINT)
+        self._last_track: tuple[str, TrackInfo] | None = None
 
         dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
         self.player_manager = PlayerManager(
-            config.get("ignore", []), self.track_updated, self.stopped_playing
+            config.get("ignore", []),
+            self.track_updated,
+            self.stopped_playing,
+            config.get("debounce_interval", 250),
         )
 
     def run_loop(self):
@@ -413,7 +619,14 @@ class MPRISListener:
         loop.run()
 
     def track_updated(self, player: Player):
-        self.track_update_callback(player.name, player.track_info)
+        track = (player.name, player.track_info)
+        if track == self._last_track:
+            # already sent, skip the Slack round trips
+            return
+
+        self._last_track = track
+        self.track_update_callback(*track)
 
     def stopped_playing(self, player: Player):
+        self._last_track = None
         self.stopped_playing_callback(player.name)
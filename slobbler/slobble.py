@@ -1,24 +1,41 @@
 import logging
 import typing as typ
-from calendar import timegm
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from datetime import datetime, timedelta
-from json import dumps
-from math import ceil
-from random import choice, seed
+from datetime import datetime, timezone
+from random import Random
+from threading import Lock
+from time import monotonic, sleep, time
 
 from requests import Session, Response
 from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
 from urllib3 import Retry
 
 from slobbler.listener import TrackInfo
 
 
+class NonAsciiTable(dict):
+    """str.translate() table that keeps ASCII and deletes everything else"""
+
+    def __missing__(self, codepoint: int) -> None:
+        # remember non-ASCII codepoints as they are seen
+        self[codepoint] = None
+        return None
+
+
+_non_ascii_table = NonAsciiTable((codepoint, codepoint) for codepoint in range(128))
+
+
 def remove_non_ascii(string: str) -> str:
-    return string.encode("ascii", errors="ignore").decode()
+    if string.isascii():
+        return string
+    return string.translate(_non_ascii_table)
 
 
 def non_ascii_equals(left: str, right: str) -> bool:
+    if left.isascii() and right.isascii():
+        return left == right
     return remove_non_ascii(left) == remove_non_ascii(right)
 
 
@@ -91,11 +108,11 @@ class TrackFilter:
         return False
 
     def check_missing_fields(self) -> bool:
-        self.missing_fields = self.required_fields.intersection(
-            self.track_info.empty_fields()
-        )
-
-        if self.missing_fields:
+        # usually nothing is missing, only build the set of missing fields to log it
+        if not self.required_fields.isdisjoint(self.track_info.empty_fields()):
+            self.missing_fields = self.required_fields.intersection(
+                self.track_info.empty_fields()
+            )
             self.passed = False
             self.logger.info(
                 f"Missing required fields: {', '.join(self.missing_fields)}"
@@ -121,9 +138,42 @@ class TrackFilter:
         return False
 
 
+class RateLimiter:
+    """Token bucket, blocks the calling thread until another request is allowed"""
+
+    __slots__ = ("rate", "capacity", "_tokens", "_last_refill")
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last_refill = monotonic()
+
+    def acquire(self):
+        self.refill()
+        if self._tokens < 1:
+            sleep((1 - self._tokens) / self.rate)
+            self.refill()
+        self._tokens -= 1
+
+    def refill(self):
+        now = monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._last_refill) * self.rate
+        )
+        self._last_refill = now
+
+
 class SlackAPI:
+    __slots__ = ("logger", "session", "timeout", "rate_limiter", "post_headers")
     _slack_api_fmt = "https://slack.com/api/{command}"
+    _presence_url = _slack_api_fmt.format(command="users.getPresence")
+    _profile_get_url = _slack_api_fmt.format(command="users.profile.get")
+    _profile_set_url = _slack_api_fmt.format(command="users.profile.set")
     _max_status_size = 97
+    # Slack asks for about one request per second, allow short bursts
+    _rate_limit = 1.0
+    _rate_limit_burst = 3
 
     def __init__(self, config: typ.Dict[str, typ.Any]):
         self.logger = logging.getLogger(self.__class__.__name__)
@@ -132,6 +182,10 @@ class SlackAPI:
             {"Authorization": f'Bearer {config["user_oauth_token"]}'}
         )
         self.session.params.update({"user": config["user_id"]})
+        # seconds, don't let a slow Slack API stall the listener indefinitely
+        self.timeout: float = config.get("timeout", 10)
+        # only used from the Slobble worker thread, waiting doesn't block DBus
+        self.rate_limiter = RateLimiter(self._rate_limit, self._rate_limit_burst)
         self.post_headers = {"Content-Type": "application/json; charset=utf-8"}
 
     @classmethod
@@ -150,14 +204,20 @@ class SlackAPI:
         assert json_response["ok"], f"Failed because {json_response['error']}"
         return json_response
 
+    def close(self):
+        self.session.close()
+
     def setup_session(self) -> Session:
         retry_strategy = Retry(
             total=3,
             backoff_factor=0.5,
-            status_forcelist=[429, 502, 503, 504],
-            method_whitelist=["HEAD", "GET", "OPTIONS", "POST"],
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["HEAD", "GET", "OPTIONS", "POST"],
+        )
+        # everything goes to slack.com from a single worker thread
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=1, max_retries=retry_strategy
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
         session = Session()
         session.mount("https://", adapter)
         session.mount("http://", adapter)
@@ -165,33 +225,55 @@ class SlackAPI:
         return session
 
     def get_presence(self) -> typ.Dict[str, typ.Any]:
-        response = self.session.get(
-            self._slack_api_fmt.format(command="users.getPresence")
-        )
+        self.rate_limiter.acquire()
+        response = self.session.get(self._presence_url, timeout=self.timeout)
         return self.validate_response(response)
 
     def get_profile(self) -> typ.Dict[str, typ.Any]:
-        response = self.session.get(
-            self._slack_api_fmt.format(command="users.profile.get")
-        )
+        self.rate_limiter.acquire()
+        response = self.session.get(self._profile_get_url, timeout=self.timeout)
         return self.validate_response(response)["profile"]
 
-    def set_profile(self, **profile: typ.Dict[str, typ.Any]) -> typ.Dict[str, typ.Any]:
+    def set_profile(self, profile: typ.Dict[str, typ.Any]) -> typ.Dict[str, typ.Any]:
+        self.rate_limiter.acquire()
         response = self.session.post(
-            self._slack_api_fmt.format(command="users.profile.set"),
+            self._profile_set_url,
             headers=self.post_headers,
-            data=dumps({"profile": profile}).encode("utf-8"),
+            json={"profile": profile},
+            timeout=self.timeout,
         )
         return self.validate_response(response)["profile"]
 
 
 class Slobble:
-    _minute_delta = timedelta(minutes=1)
+    __slots__ = (
+        "logger",
+        "slack_api",
+        "message_format",
+        "player_emoji",
+        "default_emojis",
+        "required_fields",
+        "filters",
+        "exceptions",
+        "set_expiration",
+        "status_cache_ttl",
+        "min_update_interval",
+        "_next_update_time",
+        "_cached_status",
+        "_cached_status_time",
+        "_own_status_active",
+        "_executor",
+        "_latest_update_lock",
+        "_latest_update",
+        "updatable_emojis",
+        "_rng",
+    )
     text_key = "status_text"
     emoji_key = "status_emoji"
     expiration_key = "status_expiration"
     presence_key = "presence"
     profile_keys = {text_key, emoji_key}
+    clear_profile = {text_key: "", emoji_key: "", expiration_key: 0}
 
     def __init__(self, slack_api: SlackAPI, config: typ.Dict[str, typ.Any]):
         self.logger = logging.getLogger(self.__class__.__name__)
@@ -212,28 +294,77 @@ class Slobble:
             config.get("exceptions", tuple({}))
         )
         self.set_expiration: bool = config.get("set_expiration", False)
-
-        self.updatable_emojis = {
-            "",  # empty emoji is updatable
-            *self.default_emojis,
-            *(emoji for emoji in self.player_emoji.values()),
-            *(exception.get("emoji", "") for exception in self.exceptions),
-        }
-
-        seed()
-
-    @classmethod
-    def ceil_nearest_minute(cls, dt: datetime) -> datetime:
-        return (
-            datetime.min
-            + ceil((dt - datetime.min) / cls._minute_delta) * cls._minute_delta
+        # seconds to trust the last known status before reading it from Slack again
+        self.status_cache_ttl: float = config.get("status_cache_ttl", 30)
+        self._cached_status: SlackStatus | None = None
+        self._cached_status_time: float = 0.0
+        # whether a status written by us may still be set, unknown on startup
+        self._own_status_active: bool = True
+        # seconds between status updates, a run of short tracks only sends the last
+        self.min_update_interval: float = config.get("min_update_interval", 3)
+        self._next_update_time: float = 0.0
+
+        # Slack requests run on a single worker thread so they never block the
+        # DBus main loop, only the worker touches the cached status
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slobble")
+        self._latest_update_lock = Lock()
+        self._latest_update: tuple[typ.Callable[..., None], tuple] | None = None
+
+        self.updatable_emojis = frozenset(
+            (
+                "",  # empty emoji is updatable
+                *self.default_emojis,
+                *self.player_emoji.values(),
+                *(exception.get("emoji", "") for exception in self.exceptions),
+            )
         )
 
+        # seeded from the OS on creation, leaves the global random state alone
+        self._rng = Random()
+
     @classmethod
     def parse_status(cls, profile: typ.Dict[str, typ.Any]) -> SlackStatus:
         return SlackStatus(profile[cls.text_key], profile[cls.emoji_key])
 
+    def close(self):
+        # let a pending update, like clearing the status on shutdown, finish
+        self._executor.shutdown(wait=True)
+        self.slack_api.close()
+
     def handle_track_update(self, player_name: str, track_info: TrackInfo):
+        self.submit_update(self.update_track, player_name, track_info)
+
+    def handle_stop_playing(self, player_name: str = None):
+        self.submit_update(self.stop_playing, player_name)
+
+    def submit_update(self, update_fn: typ.Callable[..., None], *args):
+        # only the latest update matters, a burst of updates collapses to one
+        with self._latest_update_lock:
+            self._latest_update = (update_fn, args)
+        self._executor.submit(self.run_latest_update)
+
+    def run_latest_update(self):
+        if self._latest_update is None:
+            # already handled by an earlier run
+            return
+
+        delay = self._next_update_time - monotonic()
+        if delay > 0:
+            # newer updates replace the pending one while waiting
+            sleep(delay)
+
+        with self._latest_update_lock:
+            latest_update, self._latest_update = self._latest_update, None
+
+        if latest_update:
+            self._next_update_time = monotonic() + self.min_update_interval
+            update_fn, args = latest_update
+            try:
+                update_fn(*args)
+            except Exception:
+                self.logger.exception(f"Failed to update status: {update_fn.__name__}")
+
+    def update_track(self, player_name: str, track_info: TrackInfo):
         current_status = self.can_update()
         if current_status:
             filter_result = TrackFilter(
@@ -247,12 +378,20 @@ class Slobble:
                     filter_result.exception_match,
                 )
             else:
-                self.handle_stop_playing()
+                self.stop_playing()
 
-    def handle_stop_playing(self, player_name: str = None):
-        if self.can_update():
-            self.logger.info("Clearing status")
-            self.write_status("", "", 0)
+    def stop_playing(self, player_name: str = None):
+        if not self._own_status_active:
+            # already cleared, nothing to read or write
+            return
+
+        current_status = self.can_update()
+        if current_status:
+            if current_status.text or current_status.emoji:
+                self.logger.info("Clearing status")
+                self.write_profile(self.clear_profile)
+            else:
+                self._own_status_active = False
 
     def scrobble_status(
         self,
@@ -263,33 +402,34 @@ class Slobble:
     ):
         status_text = self.slack_api.trim_status_text(
             # see if there is a custom message format in exception
-            exception.get("message_format", self.message_format).format(
-                **track_info.to_dict()
-            )
+            exception.get("message_format", self.message_format).format_map(track_info)
         )
         if not non_ascii_equals(status_text, current_status.text):
-            status_emoji = exception.get(
-                "emoji",  # see if there is a custom emoji in exception
-                self.pick_emoji(player_name),
-            )
-            expiration_time, expiration_epoch = self.calculate_expiration(
-                track_info.length
-            )
-            self.logger.info(
-                f"Setting status: {status_emoji}, {status_text}, {expiration_time}"
+            status_emoji = (
+                exception["emoji"]  # see if there is a custom emoji in exception
+                if "emoji" in exception
+                else self.pick_emoji(player_name)
             )
+            expiration_epoch = self.calculate_expiration(track_info.length)
+            if self.logger.isEnabledFor(logging.INFO):
+                # the datetime is only needed to log a readable expiration
+                expiration_time = (
+                    datetime.fromtimestamp(expiration_epoch, timezone.utc)
+                    if expiration_epoch
+                    else None
+                )
+                self.logger.info(
+                    f"Setting status: {status_emoji}, {status_text}, {expiration_time}"
+                )
             self.write_status(status_text, status_emoji, expiration_epoch)
         else:
             self.logger.warning("Skipping status update, nothing to change")
 
-    def calculate_expiration(self, length_seconds: int) -> tuple[datetime | None, int]:
+    def calculate_expiration(self, length_seconds: int) -> int:
         if self.set_expiration and length_seconds:
             # sometimes slack the message expires too soon, round up to the nearest minute
-            expiration_time = self.ceil_nearest_minute(
-                datetime.utcnow() + timedelta(seconds=length_seconds)
-            )
-            return expiration_time, timegm(expiration_time.timetuple())
-        return None, 0
+            return int(-(-(time() + length_seconds) // 60)) * 60
+        return 0
 
     def can_update(self) -> SlackStatus | typ.Literal[False]:
         """don't override any other status, based upon the current emoji"""
@@ -308,33 +448,64 @@ class Slobble:
         return False
 
     def pick_emoji(self, player_name: str) -> str:
-        return self.player_emoji.get(
-            player_name,  # try player name specific emoji
-            choice(self.default_emojis),  # fallback to a random choice of emojis
-        )
+        # try player name specific emoji
+        emoji = self.player_emoji.get(player_name)
+        if emoji is None:
+            # fallback to a random choice of emojis, only drawn when needed
+            emoji = self._rng.choice(self.default_emojis)
+        return emoji
 
     def is_active(self) -> bool:
         return self.slack_api.get_presence()[self.presence_key] == "active"
 
     def read_status(self) -> SlackStatus:
-        return self.parse_status(self.slack_api.get_profile())
+        if (
+            self._cached_status
+            and monotonic() - self._cached_status_time < self.status_cache_ttl
+        ):
+            return self._cached_status
+        return self.cache_status(self.parse_status(self.slack_api.get_profile()))
 
     def write_status(self, message: str, emoji: str, expiration: int) -> SlackStatus:
-        response = self.slack_api.set_profile(
-            **{
+        return self.write_profile(
+            {
                 self.text_key: message,
                 self.emoji_key: emoji,
                 self.expiration_key: expiration,
             }
         )
 
-        return self.parse_status(response)
+    def write_profile(self, profile: typ.Dict[str, typ.Any]) -> SlackStatus:
+        try:
+            response = self.slack_api.set_profile(profile)
+        except (AssertionError, RequestException):
+            # unknown what the status is now, read it again next time
+            self.invalidate_status()
+            raise
+
+        self._own_status_active = bool(profile[self.text_key])
+        return self.cache_status(self.parse_status(response))
+
+    def cache_status(self, status: SlackStatus) -> SlackStatus:
+        if status.emoji in self.updatable_emojis:
+            self._cached_status = status
+            self._cached_status_time = monotonic()
+        else:
+            # someone else set this status, read it again before every update
+            self.invalidate_status()
+        return status
+
+    def invalidate_status(self):
+        self._cached_status = None
 
 
 class NoScrobble:
     def __init__(self, *args, **kwargs):
         self.logger = logging.getLogger(self.__class__.__name__)
 
+    def close(self):
+        pass
+
     def handle_track_update(self, player_name: str, track_info: TrackInfo):
         self.logger.info(f"handle_track_update({player_name=}, {track_info=})")
 